@@ -6,10 +6,20 @@ Provides comprehensive visualization functions for e-commerce sales analysis inc
 - Seasonal decomposition
 - Heatmaps for month-over-month comparison
 - Bar charts for YTD vs PYTD vs P1YTD comparison
-""\
+"""
 
+import os
+import sys
 import pandas as pd
 import numpy as np
+import matplotlib
+
+# Use the non-interactive backend on headless Linux (cron jobs, CI) unless a
+# backend was chosen explicitly or we are running inside a Jupyter kernel
+if (sys.platform.startswith('linux') and not os.environ.get('DISPLAY')
+        and not os.environ.get('MPLBACKEND') and 'ipykernel' not in sys.modules):
+    matplotlib.use('Agg')
+
 import matplotlib.pyplot as plt
 import seaborn as sns
 import plotly.express as px
@@ -19,12 +29,70 @@ from statsmodels.tsa.seasonal import seasonal_decompose
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    import datashader as ds
+    import datashader.transfer_functions as tf
+except ImportError:
+    ds = None
+
 # Set style
 sns.set_style('whitegrid')
 plt.rcParams['figure.figsize'] = (12, 6)
 
+# Above this many products, time series are drawn as one WebGL trace
+MAX_PRODUCT_TRACES = 30
+
+# Above this many points, the delta scatter is rasterized with datashader
+MAX_SCATTER_POINTS = 10000
+
+
+def _add_rasterized_scatter(fig, df, x, y, weight, width=1000, height=600):
+    """
+    Aggregate points into pixels with datashader and add the result to a
+    Plotly figure as a background image. Points above y=0 are shaded green,
+    points below in red.
+    
+    Args:
+        fig: Plotly figure to draw into
+        df: DataFrame with the x, y and weight columns
+        x, y: Column names for the axes
+        weight: Column summed per pixel to set the shading intensity
+        width, height: Raster size in pixels
+    """
+    def axis_range(column):
+        # datashader needs a non-zero span, so pad constant columns
+        lo, hi = float(df[column].min()), float(df[column].max())
+        if lo == hi:
+            pad = abs(lo) * 0.05 or 1.0
+            lo, hi = lo - pad, hi + pad
+        return lo, hi
+    
+    x_range = axis_range(x)
+    y_range = axis_range(y)
+    
+    canvas = ds.Canvas(plot_width=width, plot_height=height, x_range=x_range, y_range=y_range)
+    agg = canvas.points(df, x, y, ds.sum(weight))
+    img = tf.stack(
+        tf.shade(agg.where(agg[y] >= 0), cmap=['#a1d99b', 'green']),
+        tf.shade(agg.where(agg[y] < 0), cmap=['#fc9272', 'red'])
+    )
+    
+    fig.add_layout_image(
+        source=img.to_pil(),
+        xref='x',
+        yref='y',
+        x=x_range[0],
+        y=y_range[1],
+        sizex=x_range[1] - x_range[0],
+        sizey=y_range[1] - y_range[0],
+        sizing='stretch',
+        layer='below'
+    )
+    fig.update_xaxes(range=x_range)
+    fig.update_yaxes(range=y_range)
+
 
-def plot_ytd_scatter_with_delta(metrics_df, save_path=None):
+def plot_ytd_scatter_with_delta(metrics_df, save_path=None, show=True):
     """
     Create scatter plot with YTD on X-axis, Delta on Y-axis.
     Negative deltas in RED, Positive deltas in GREEN.
@@ -33,32 +101,33 @@ def plot_ytd_scatter_with_delta(metrics_df, save_path=None):
     Args:
         metrics_df: DataFrame with ytd_sales, delta_ytd_pytd, product_name
         save_path: Optional path to save the figure
+        show: Whether to display the figure (default True)
     """
-    df = metrics_df.copy()
-    
-    # Create color column based on delta
-    df['color'] = df['delta_ytd_pytd'].apply(lambda x: 'red' if x < 0 else 'green')
-    df['size'] = df['abs_delta_ytd_pytd']
+    df = metrics_df
     
     # Create figure
     fig = go.Figure()
     
-    # Add traces for negative (red) and positive (green) separately
-    for color_val, color_name in [('red', 'Declining'), ('green', 'Growing')]:
-        df_subset = df[df['color'] == color_val]
+    if ds is not None and len(df) > MAX_SCATTER_POINTS:
+        # Too many points to draw individually; shade aggregated pixels instead
+        _add_rasterized_scatter(fig, df, 'ytd_sales', 'delta_ytd_pytd', 'abs_delta_ytd_pytd')
+    else:
+        # Per-point colors based on delta
+        colors = np.where(df['delta_ytd_pytd'] < 0, 'red', 'green')
         
-        fig.add_trace(go.Scatter(
-            x=df_subset['ytd_sales'],
-            y=df_subset['delta_ytd_pytd'],
+        # Single WebGL trace for all points, colored per point
+        fig.add_trace(go.Scattergl(
+            x=df['ytd_sales'].to_numpy(),
+            y=df['delta_ytd_pytd'].to_numpy(),
             mode='markers+text',
-            name=color_name,
+            showlegend=False,
             marker=dict(
-                size=df_subset['size'] / 100000,  # Scale for visibility
-                color=color_val,
+                size=df['abs_delta_ytd_pytd'].to_numpy() / 100000,  # Scale for visibility
+                color=colors,
                 opacity=0.7,
                 line=dict(width=1, color='white')
             ),
-            text=df_subset['product_name'],
+            text=df['product_name'].to_numpy(),
             textposition='top center',
             textfont=dict(size=9),
             hovertemplate='<b>%{text}</b><br>' +
@@ -67,6 +136,17 @@ def plot_ytd_scatter_with_delta(metrics_df, save_path=None):
                          '<extra></extra>'
         ))
     
+    # Legend-only entries for declining (red) and growing (green)
+    for color_val, color_name in [('red', 'Declining'), ('green', 'Growing')]:
+        fig.add_trace(go.Scattergl(
+            x=[None],
+            y=[None],
+            mode='markers',
+            name=color_name,
+            showlegend=True,
+            marker=dict(size=10, color=color_val, opacity=0.7)
+        ))
+    
     # Add zero line
     fig.add_hline(y=0, line_dash='dash', line_color='black', opacity=0.5)
     
@@ -83,40 +163,43 @@ def plot_ytd_scatter_with_delta(metrics_df, save_path=None):
     if save_path:
         fig.write_html(save_path)
     
-    fig.show()
+    if show:
+        fig.show()
     return fig
 
 
-def plot_ytd_comparison_bars(metrics_df, save_path=None):
+def plot_ytd_comparison_bars(metrics_df, save_path=None, show=True):
     """
     Create grouped bar chart comparing YTD, PYTD, and P1YTD for each product.
     
     Args:
         metrics_df: DataFrame with ytd_sales, pytd_sales, p1ytd_sales
         save_path: Optional path to save figure
+        show: Whether to display the figure (default True)
     """
-    df = metrics_df.copy()
+    df = metrics_df
+    products = df['product_name'].to_numpy()
     
     fig = go.Figure()
     
     fig.add_trace(go.Bar(
         name='YTD (Current)',
-        x=df['product_name'],
-        y=df['ytd_sales'],
+        x=products,
+        y=df['ytd_sales'].to_numpy(),
         marker_color='#2E86AB'
     ))
     
     fig.add_trace(go.Bar(
         name='PYTD (Previous Year)',
-        x=df['product_name'],
-        y=df['pytd_sales'],
+        x=products,
+        y=df['pytd_sales'].to_numpy(),
         marker_color='#A23B72'
     ))
     
     fig.add_trace(go.Bar(
         name='P1YTD (2 Years Ago)',
-        x=df['product_name'],
-        y=df['p1ytd_sales'],
+        x=products,
+        y=df['p1ytd_sales'].to_numpy(),
         marker_color='#F18F01'
     ))
     
@@ -133,11 +216,12 @@ def plot_ytd_comparison_bars(metrics_df, save_path=None):
     if save_path:
         fig.write_html(save_path)
     
-    fig.show()
+    if show:
+        fig.show()
     return fig
 
 
-def plot_time_series_by_product(monthly_df, products=None, save_path=None):
+def plot_time_series_by_product(monthly_df, products=None, save_path=None, show=True):
     """
     Plot time series of monthly sales for selected products.
     
@@ -145,21 +229,46 @@ def plot_time_series_by_product(monthly_df, products=None, save_path=None):
         monthly_df: DataFrame with year_month, product_name, sales_amount
         products: List of products to plot (None = all)
         save_path: Optional save path
+        show: Whether to display the figure (default True)
     """
-    df = monthly_df.copy()
+    df = monthly_df
     
     if products:
         df = df[df['product_name'].isin(products)]
     
-    fig = px.line(
-        df,
-        x='year_month',
-        y='sales_amount',
-        color='product_name',
-        title='Monthly Sales Trends by Product',
-        labels={'year_month': 'Month', 'sales_amount': 'Sales (₹)', 'product_name': 'Product'},
-        markers=True
-    )
+    if df['product_name'].nunique() > MAX_PRODUCT_TRACES:
+        # One trace for all products, with a gap between consecutive products
+        df = df.sort_values(['product_name', 'year_month'])
+        codes, _ = pd.factorize(df['product_name'], sort=True)
+        breaks = np.flatnonzero(np.diff(codes)) + 1
+        palette = np.array(px.colors.qualitative.Plotly)
+        
+        fig = go.Figure(go.Scattergl(
+            x=np.insert(df['year_month'].astype(object).to_numpy(), breaks, None),
+            y=np.insert(df['sales_amount'].to_numpy(dtype=float), breaks, np.nan),
+            mode='lines+markers',
+            line=dict(color='lightgray', width=1),
+            marker=dict(color=np.insert(palette[codes % len(palette)], breaks, palette[0]), size=5),
+            text=np.insert(df['product_name'].astype(object).to_numpy(), breaks, None),
+            hovertemplate='<b>%{text}</b><br>Month: %{x}<br>Sales: ₹%{y:,.0f}<extra></extra>',
+            showlegend=False
+        ))
+        fig.update_layout(
+            title='Monthly Sales Trends by Product',
+            xaxis_title='Month',
+            yaxis_title='Sales (₹)'
+        )
+    else:
+        fig = px.line(
+            df,
+            x='year_month',
+            y='sales_amount',
+            color='product_name',
+            title='Monthly Sales Trends by Product',
+            labels={'year_month': 'Month', 'sales_amount': 'Sales (₹)', 'product_name': 'Product'},
+            markers=True,
+            render_mode='webgl'
+        )
     
     fig.update_layout(
         height=600,
@@ -170,7 +279,8 @@ def plot_time_series_by_product(monthly_df, products=None, save_path=None):
     if save_path:
         fig.write_html(save_path)
     
-    fig.show()
+    if show:
+        fig.show()
     return fig
 
 
@@ -183,8 +293,15 @@ def plot_seasonal_decomposition(sales_series, period=12, save_path=None):
         period: Seasonality period (default 12 for monthly)
         save_path: Optional save path
     """
-    # Perform seasonal decomposition
-    decomposition = seasonal_decompose(sales_series, model='additive', period=period)
+    # Perform seasonal decomposition on a contiguous float64 copy of the values,
+    # extrapolating the trend so its head and tail are not NaN
+    values = np.ascontiguousarray(sales_series.to_numpy(dtype=np.float64))
+    decomposition = seasonal_decompose(
+        pd.Series(values, index=sales_series.index),
+        model='additive',
+        period=period,
+        extrapolate_trend='freq'
+    )
     
     # Create subplots
     fig, axes = plt.subplots(4, 1, figsize=(14, 10))
@@ -211,8 +328,8 @@ def plot_seasonal_decomposition(sales_series, period=12, save_path=None):
     
     if save_path:
         plt.savefig(save_path, dpi=300, bbox_inches='tight')
-    
-    plt.show()
+    else:
+        plt.show()
     return fig
 
 
@@ -224,16 +341,14 @@ def plot_heatmap_monthly_sales(monthly_df, save_path=None):
         monthly_df: DataFrame with year_month, product_name, sales_amount
         save_path: Optional save path
     """
-    # Pivot data
-    pivot_df = monthly_df.pivot_table(
-        index='product_name',
-        columns='year_month',
-        values='sales_amount',
-        aggfunc='sum'
+    # Pivot data (already one row per product and month, so no aggregation needed)
+    pivot_df = monthly_df.set_index(['product_name', 'year_month'])['sales_amount'].unstack(
+        'year_month',
+        fill_value=0
     )
     
     # Create heatmap
-    plt.figure(figsize=(16, 8))
+    fig = plt.figure(figsize=(16, 8))
     sns.heatmap(
         pivot_df,
         annot=False,
@@ -251,31 +366,33 @@ def plot_heatmap_monthly_sales(monthly_df, save_path=None):
     
     if save_path:
         plt.savefig(save_path, dpi=300, bbox_inches='tight')
-    
-    plt.show()
+    else:
+        plt.show()
+    return fig
 
 
-def plot_growth_percentage(metrics_df, save_path=None):
+def plot_growth_percentage(metrics_df, save_path=None, show=True):
     """
     Plot growth percentage comparing YTD vs PYTD.
     
     Args:
         metrics_df: DataFrame with growth_ytd_vs_pytd_pct
         save_path: Optional save path
+        show: Whether to display the figure (default True)
     """
-    df = metrics_df.copy().sort_values('growth_ytd_vs_pytd_pct', ascending=True)
+    df = metrics_df.sort_values('growth_ytd_vs_pytd_pct', ascending=True)
     
     # Color based on positive/negative
-    colors = ['green' if x >= 0 else 'red' for x in df['growth_ytd_vs_pytd_pct']]
+    colors = np.where(df['growth_ytd_vs_pytd_pct'] >= 0, 'green', 'red')
     
     fig = go.Figure()
     
     fig.add_trace(go.Bar(
-        x=df['growth_ytd_vs_pytd_pct'],
-        y=df['product_name'],
+        x=df['growth_ytd_vs_pytd_pct'].to_numpy(),
+        y=df['product_name'].to_numpy(),
         orientation='h',
         marker=dict(color=colors),
-        text=df['growth_ytd_vs_pytd_pct'].round(1).astype(str) + '%',
+        text=(df['growth_ytd_vs_pytd_pct'].round(1).astype(str) + '%').to_numpy(),
         textposition='outside',
         hovertemplate='<b>%{y}</b><br>Growth: %{x:.1f}%<extra></extra>'
     ))
@@ -293,7 +410,8 @@ def plot_growth_percentage(metrics_df, save_path=None):
     if save_path:
         fig.write_html(save_path)
     
-    fig.show()
+    if show:
+        fig.show()
     return fig
 
 
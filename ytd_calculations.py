@@ -10,8 +10,10 @@ Functions:
     - calculate_deltas: Calculate growth/decline metrics
 """
 
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
+from functools import lru_cache
 from typing import Tuple, Dict
 
 
@@ -28,12 +30,16 @@ def get_fiscal_year(date: datetime) -> str:
     """
     if date.month >= 4:  # April to December
         fy_start = date.year
-        fy_end = date.year + 1
     else:  # January to March
         fy_start = date.year - 1
-        fy_end = date.year
     
-    return f"FY {fy_start}-{str(fy_end)[-2:]}"
+    return _fiscal_year_label(fy_start)
+
+
+@lru_cache(maxsize=None)
+def _fiscal_year_label(fy_start: int) -> str:
+    """Format the fiscal year label for a fiscal year starting in fy_start."""
+    return f"FY {fy_start}-{str(fy_start + 1)[-2:]}"
 
 
 def get_ytd_date_range(as_of_date: datetime) -> Tuple[datetime, datetime]:
@@ -54,19 +60,31 @@ def get_ytd_date_range(as_of_date: datetime) -> Tuple[datetime, datetime]:
     return fiscal_year_start, as_of_date
 
 
-def calculate_ytd_metrics(df: pd.DataFrame, as_of_date: datetime = None) -> pd.DataFrame:
+def calculate_ytd_metrics(df: pd.DataFrame, as_of_date: datetime = None,
+                          date_format: str = None) -> pd.DataFrame:
     """
     Calculate YTD, PYTD, and P1YTD metrics for all products.
     
     Args:
         df: Sales DataFrame with columns: date, product_name, sales_amount, quantity
         as_of_date: Date to calculate YTD as of (default: latest date in data)
+        date_format: Optional format for parsing a non-datetime date column (e.g. 'ISO8601')
     
     Returns:
         DataFrame with YTD, PYTD, P1YTD metrics by product
+    
+    Note:
+        Sales are summed in float32, so totals are accurate to about 7 significant
+        digits; crore-scale totals are rounded to the nearest few rupees (paise are lost).
     """
     # Convert date column to datetime if not already
-    df['date'] = pd.to_datetime(df['date'])
+    if not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df['date'] = pd.to_datetime(df['date'], format=date_format)
+    
+    # Narrower numeric types halve the memory traffic through the aggregation
+    df = df.astype({'sales_amount': 'float32'})
+    if pd.api.types.is_integer_dtype(df['quantity']):
+        df['quantity'] = pd.to_numeric(df['quantity'], downcast='integer')
     
     # Use latest date if as_of_date not provided
     if as_of_date is None:
@@ -79,48 +97,55 @@ def calculate_ytd_metrics(df: pd.DataFrame, as_of_date: datetime = None) -> pd.D
     ytd_start, ytd_end = get_ytd_date_range(as_of_date)
     
     # PYTD: Same period in previous fiscal year
-    pytd_start = ytd_start - timedelta(days=365)
-    pytd_end = ytd_end - timedelta(days=365)
+    pytd_start = ytd_start - pd.DateOffset(years=1)
+    pytd_end = ytd_end - pd.DateOffset(years=1)
     
     # P1YTD: Same period two fiscal years ago
-    p1ytd_start = ytd_start - timedelta(days=730)
-    p1ytd_end = ytd_end - timedelta(days=730)
+    p1ytd_start = ytd_start - pd.DateOffset(years=2)
+    p1ytd_end = ytd_end - pd.DateOffset(years=2)
     
     print(f"\nCalculating metrics as of {as_of_date.strftime('%Y-%m-%d')} ({current_fy})")
     print(f"YTD Period: {ytd_start.strftime('%Y-%m-%d')} to {ytd_end.strftime('%Y-%m-%d')}")
     print(f"PYTD Period: {pytd_start.strftime('%Y-%m-%d')} to {pytd_end.strftime('%Y-%m-%d')}")
     print(f"P1YTD Period: {p1ytd_start.strftime('%Y-%m-%d')} to {p1ytd_end.strftime('%Y-%m-%d')}")
     
-    # Filter data for each period
-    ytd_data = df[(df['date'] >= ytd_start) & (df['date'] <= ytd_end)]
-    pytd_data = df[(df['date'] >= pytd_start) & (df['date'] <= pytd_end)]
-    p1ytd_data = df[(df['date'] >= p1ytd_start) & (df['date'] <= p1ytd_end)]
-    
-    # Aggregate by product
-    ytd_summary = ytd_data.groupby('product_name').agg({
-        'sales_amount': 'sum',
-        'quantity': 'sum'
-    }).reset_index()
-    ytd_summary.columns = ['product_name', 'ytd_sales', 'ytd_quantity']
-    
-    pytd_summary = pytd_data.groupby('product_name').agg({
-        'sales_amount': 'sum',
-        'quantity': 'sum'
-    }).reset_index()
-    pytd_summary.columns = ['product_name', 'pytd_sales', 'pytd_quantity']
-    
-    p1ytd_summary = p1ytd_data.groupby('product_name').agg({
+    # Slice out each period: a binary search when the dates are already sorted,
+    # otherwise a boolean mask (cheaper than sorting the whole frame)
+    periods = ['ytd', 'pytd', 'p1ytd']
+    period_ranges = [(ytd_start, ytd_end), (pytd_start, pytd_end), (p1ytd_start, p1ytd_end)]
+    value_columns = ['product_name', 'sales_amount', 'quantity']
+    is_sorted = df['date'].is_monotonic_increasing
+    period_slices = []
+    for code, (start, end) in enumerate(period_ranges):
+        if is_sorted:
+            lo = df['date'].searchsorted(start, side='left')
+            hi = df['date'].searchsorted(end, side='right')
+            period_df = df.iloc[lo:hi][value_columns]
+        else:
+            period_df = df.loc[(df['date'] >= start) & (df['date'] <= end), value_columns]
+        period_slices.append(period_df.assign(period=np.int8(code)))
+    period_data = pd.concat(period_slices, ignore_index=True)
+    
+    # Hash product names once, on the in-window rows only, so the groupby works on codes
+    period_data['product_name'] = period_data['product_name'].astype('category')
+    
+    # Aggregate by product and period in a single pass, widening the small result back
+    aggregated = period_data.groupby(['product_name', 'period'], observed=True).agg({
         'sales_amount': 'sum',
         'quantity': 'sum'
-    }).reset_index()
-    p1ytd_summary.columns = ['product_name', 'p1ytd_sales', 'p1ytd_quantity']
+    }).astype({'sales_amount': 'float64'})
+    summary = aggregated.unstack('period', fill_value=0)
     
-    # Merge all metrics
-    metrics = ytd_summary.merge(pytd_summary, on='product_name', how='outer')
-    metrics = metrics.merge(p1ytd_summary, on='product_name', how='outer')
+    # Flatten to ytd_sales, ytd_quantity, pytd_sales, ... columns (period codes index
+    # into periods), keeping the aggregated dtypes for periods with no data
+    columns = [(value, code) for code in range(len(periods)) for value in ['sales_amount', 'quantity']]
+    summary = summary.reindex(columns=columns, fill_value=0)
+    summary = summary.astype({column: aggregated[column[0]].dtype for column in columns})
+    summary.columns = [f"{p}_{name}" for p in periods for name in ['sales', 'quantity']]
+    metrics = summary.reset_index()
     
-    # Fill NaN values with 0
-    metrics = metrics.fillna(0)
+    # Restore the caller's product_name dtype on the small per-product result
+    metrics['product_name'] = metrics['product_name'].astype(df['product_name'].dtype)
     
     # Add fiscal year info
     metrics['as_of_date'] = as_of_date
@@ -146,40 +171,58 @@ def calculate_deltas(metrics: pd.DataFrame) -> pd.DataFrame:
     df['delta_ytd_p1ytd'] = df['ytd_sales'] - df['p1ytd_sales']
     df['delta_pytd_p1ytd'] = df['pytd_sales'] - df['p1ytd_sales']
     
-    # Growth percentages
-    df['growth_ytd_vs_pytd_pct'] = ((df['ytd_sales'] - df['pytd_sales']) / df['pytd_sales'] * 100).replace([float('inf'), -float('inf')], 0)
-    df['growth_ytd_vs_p1ytd_pct'] = ((df['ytd_sales'] - df['p1ytd_sales']) / df['p1ytd_sales'] * 100).replace([float('inf'), -float('inf')], 0)
+    # Growth percentages (0 where the base period had no sales)
+    ytd = df['ytd_sales'].values
+    pytd = df['pytd_sales'].values
+    p1ytd = df['p1ytd_sales'].values
+    df['growth_ytd_vs_pytd_pct'] = np.divide((ytd - pytd) * 100, pytd, out=np.zeros(len(df)), where=pytd != 0)
+    df['growth_ytd_vs_p1ytd_pct'] = np.divide((ytd - p1ytd) * 100, p1ytd, out=np.zeros(len(df)), where=p1ytd != 0)
     
     # Quantity deltas
     df['qty_delta_ytd_pytd'] = df['ytd_quantity'] - df['pytd_quantity']
     df['qty_delta_ytd_p1ytd'] = df['ytd_quantity'] - df['p1ytd_quantity']
     
     # Absolute delta for bubble size in visualizations
-    df['abs_delta_ytd_pytd'] = df['delta_ytd_pytd'].abs()
+    df['abs_delta_ytd_pytd'] = np.abs(df['delta_ytd_pytd'].values)
     
     # Performance classification
-    df['performance'] = df['delta_ytd_pytd'].apply(
-        lambda x: 'Growing' if x > 0 else ('Declining' if x < 0 else 'Stable')
+    df['performance'] = np.select(
+        [df['delta_ytd_pytd'] > 0, df['delta_ytd_pytd'] < 0],
+        ['Growing', 'Declining'],
+        default='Stable'
     )
     
     return df
 
 
-def get_monthly_trends(df: pd.DataFrame) -> pd.DataFrame:
+def get_monthly_trends(df: pd.DataFrame, date_format: str = None) -> pd.DataFrame:
     """
     Calculate monthly sales trends by product.
     
     Args:
         df: Sales DataFrame with date, product_name, sales_amount
+        date_format: Optional format for parsing a non-datetime date column (e.g. 'ISO8601')
     
     Returns:
         DataFrame with monthly aggregated sales by product
     """
-    df['date'] = pd.to_datetime(df['date'])
+    if not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df['date'] = pd.to_datetime(df['date'], format=date_format)
     df['year_month'] = df['date'].dt.to_period('M')
-    df['fiscal_year'] = df['date'].apply(get_fiscal_year)
     
-    monthly = df.groupby(['year_month', 'fiscal_year', 'product_name']).agg({
+    # Fiscal year starts in April; label each distinct start year only once.
+    # Rows without a date get code -1 (NaN) and drop out of the groupby.
+    has_date = df['date'].notna().to_numpy()
+    year = df['date'].dt.year.to_numpy()[has_date].astype(int)
+    month = df['date'].dt.month.to_numpy()[has_date]
+    fy_codes = np.full(len(df), -1)
+    fy_years, fy_codes[has_date] = np.unique(np.where(month >= 4, year, year - 1), return_inverse=True)
+    df['fiscal_year'] = pd.Categorical.from_codes(
+        fy_codes,
+        [get_fiscal_year(datetime(year, 4, 1)) for year in fy_years]
+    )
+    
+    monthly = df.groupby(['year_month', 'fiscal_year', 'product_name'], observed=True).agg({
         'sales_amount': 'sum',
         'quantity': 'sum'
     }).reset_index()
@@ -200,12 +243,16 @@ def get_category_performance(df: pd.DataFrame, product_category_map: Dict[str, s
     Returns:
         DataFrame with category-level YTD metrics
     """
-    # Add category column
-    df_with_cat = df.copy()
-    df_with_cat['category'] = df_with_cat['product_name'].map(product_category_map)
+    # Build a slim frame keyed by category in place of product
+    category_df = pd.DataFrame({
+        'date': df['date'],
+        'product_name': df['product_name'].map(pd.Series(product_category_map)),
+        'sales_amount': df['sales_amount'],
+        'quantity': df['quantity']
+    })
     
     # Calculate metrics by category
-    metrics = calculate_ytd_metrics(df_with_cat.rename(columns={'category': 'product_name'}))
+    metrics = calculate_ytd_metrics(category_df)
     metrics = calculate_deltas(metrics)
     
     return metrics.rename(columns={'product_name': 'category'})